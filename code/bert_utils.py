@@ -96,10 +96,13 @@ def get_tokenized_dataset(dataset_id: Literal['full', 'small_balanced', 'small',
                           dataset: Dataset,
                           tokenizer,
                           pad=False,
-                          use_cache=True):
+                          use_cache=True,
+                          num_proc=None):
     """Creates a tokenized dataset from a dataset.
 
-    Loads dataset from cache if exists, creates it otherwise.
+    Loads dataset from cache if exists, creates it otherwise. The cache is
+    stored as Arrow files and memory-mapped when loaded, and is kept
+    separately for each tokenizer and padding setting.
 
     Args:
         dataset_id: dataset version to load/create.
@@ -107,13 +110,22 @@ def get_tokenized_dataset(dataset_id: Literal['full', 'small_balanced', 'small',
         tokenizer: the tokenizer to use.
         pad: whether to pad the data or not. Defaults to False.
         use_cache: whether to load from cache. Defaults to True.
+        num_proc: number of processes used for tokenization. Defaults to
+          None (single process).
 
     Returns:
         The tokenized dataset.
     """
 
+    # Token ids depend on the tokenizer and the padding, so both are part of
+    # the cache key
+    tokenizer_short = tokenizer.name_or_path.split('/')[-1]
+    cache_name = f'tokenized_dataset_{tokenizer_short}'
+    if pad:
+        cache_name += '_padded'
+
     cache_path = os.path.join(DATA_CACHE_PATH, dataset_id)
-    tokenized_dataset_path = os.path.join(cache_path, 'tokenized_dataset')
+    tokenized_dataset_path = os.path.join(cache_path, cache_name)
 
     if use_cache:
         try:
@@ -124,17 +136,27 @@ def get_tokenized_dataset(dataset_id: Literal['full', 'small_balanced', 'small',
             pass
 
     print('Tokenizing dataset...')
+    # Tokenize in batches so the fast tokenizer is called once per batch of
+    # texts instead of once per sample. If `num_proc` is set, each split is
+    # sharded across that many worker processes, each with its own copy of
+    # the tokenizer.
     if pad:
         tokenized_dataset = dataset.map(
-            lambda sample: tokenizer(sample['text'],
-                                     truncation=True,
-                                     padding='max_length',
-                                     max_length=512))
+            lambda batch: tokenizer(batch['text'],
+                                    truncation=True,
+                                    padding='max_length',
+                                    max_length=512),
+            batched=True,
+            batch_size=1000,
+            num_proc=num_proc)
     else:
-        tokenized_dataset = dataset.map(lambda sample: tokenizer(
-            sample['text'],
+        tokenized_dataset = dataset.map(lambda batch: tokenizer(
+            batch['text'],
             truncation=True,
-        ))
+        ),
+                                        batched=True,
+                                        batch_size=1000,
+                                        num_proc=num_proc)
 
     tokenized_dataset.save_to_disk(os.path.join(tokenized_dataset_path))
 
@@ -162,11 +184,20 @@ def get_tf_dataset(tokenized_dataset, batch_size, tokenizer):
         tf_dataset[key] = dataset.to_tf_dataset(
             columns=['attention_mask', 'input_ids', 'token_type_ids'],
             label_cols=['label'],
-            shuffle=key != 'test',
+            shuffle=key == 'train',
+            # to_tf_dataset ties drop_remainder to shuffle; drop it explicitly
+            # for valid so val_loss is computed over the same full batches as
+            # train
+            drop_remainder=key != 'test',
             collate_fn=data_collator,
             batch_size=batch_size,
         )
 
+        # The validation split is read every epoch in the same order, so
+        # collated batches can be kept in memory after the first pass
+        if key == 'valid':
+            tf_dataset[key] = tf_dataset[key].cache()
+
     return tf_dataset
 
 
@@ -1,6 +1,6 @@
 import numpy as np
 from pathlib import Path
-from sklearn.metrics import confusion_matrix, accuracy_score, f1_score
+from sklearn.metrics import confusion_matrix, f1_score
 import seaborn as sn
 import matplotlib.pyplot as plt
 
@@ -92,14 +92,17 @@ def evaluate(model_name: str, y_pred_probas: np.ndarray, y_true: np.ndarray,
     # Probabilities -> class predictions
     y_pred = np.argmax(y_pred_probas, axis=1)
 
-    cm_norm = confusion_matrix(y_true, y_pred, normalize="true")
-    cm_norm = np.around(cm_norm, 3)
+    # Count the confusion matrix once and derive the normalized matrix and
+    # the accuracy from it
     cm = confusion_matrix(y_true, y_pred)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cm_norm = cm / cm.sum(axis=1, keepdims=True)
+    cm_norm = np.around(np.nan_to_num(cm_norm), 3)
 
     cm_heatmap = get_heatmap(cm)
     cm_heatmap_norm = get_heatmap(cm_norm)
 
-    acc = accuracy_score(y_true, y_pred)
+    acc = np.trace(cm) / cm.sum()
 
     metrics, figures = evaluate_multiclass(y_true, y_pred)
 
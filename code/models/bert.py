@@ -19,6 +19,17 @@ from bert_utils import get_dataset, get_tokenized_dataset, get_tf_dataset
 from config import RESULTS_PATH, JOBS_PATH
 
 
+class Float32SparseCategoricalCrossentropy(SparseCategoricalCrossentropy):
+    """Sparse categorical cross-entropy computed on float32 predictions.
+
+    Under a mixed_float16 policy the classifier head returns float16 logits;
+    casting them keeps the softmax and the loss numerically stable.
+    """
+
+    def call(self, y_true, y_pred):
+        return super().call(y_true, tf.cast(y_pred, tf.float32))
+
+
 class BERT():
 
     def __init__(self, params):
@@ -34,20 +45,45 @@ class BERT():
         self.save_checkpoints = params['save_checkpoints']
         self.epochs = params['epochs']
         self.save_results = params['save_results']
+        self.mixed_precision = params.get('mixed_precision', False)
+        self.tokenizer_num_proc = params.get('tokenizer_num_proc', None)
 
         # Create tokenizer and load model
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_id)
         config = AutoConfig.from_pretrained(self.model_id, num_labels=5)
-        self.model = TFAutoModelForSequenceClassification.from_pretrained(
-            self.model_id, config=config, from_pt=True)
-        if self.freeze_bert:
-            self.model.bert.trainable = False
-        if self.freeze_bert_encoder:
-            self.model.bert.encoder.trainable = False
-        self.model.compile(optimizer=tf.keras.optimizers.Adam(
-            learning_rate=self.learning_rate),
-                           loss=SparseCategoricalCrossentropy(from_logits=True),
-                           metrics=['accuracy'])
+
+        # Compute in float16 while keeping variables in float32. Must be set
+        # before the model is built.
+        if self.mixed_precision:
+            tf.keras.mixed_precision.set_global_policy('mixed_float16')
+
+        # Replicate the model on all visible GPUs (falls back to a single
+        # device otherwise). Each batch of `batch_size` samples is split
+        # across the replicas and gradients are all-reduced.
+        self.strategy = tf.distribute.MirroredStrategy()
+        print('Number of replicas:', self.strategy.num_replicas_in_sync)
+
+        with self.strategy.scope():
+            self.model = TFAutoModelForSequenceClassification.from_pretrained(
+                self.model_id, config=config, from_pt=True)
+            if self.freeze_bert:
+                self.model.bert.trainable = False
+            if self.freeze_bert_encoder:
+                self.model.bert.encoder.trainable = False
+            optimizer = tf.keras.optimizers.Adam(
+                learning_rate=self.learning_rate)
+            if self.mixed_precision:
+                # Scale the loss to avoid float16 gradient underflow. compile
+                # would wrap the optimizer under this policy anyway; this is
+                # only to make it explicit.
+                optimizer = tf.keras.mixed_precision.LossScaleOptimizer(
+                    optimizer)
+                loss = Float32SparseCategoricalCrossentropy(from_logits=True)
+            else:
+                loss = SparseCategoricalCrossentropy(from_logits=True)
+            self.model.compile(optimizer=optimizer,
+                               loss=loss,
+                               metrics=['accuracy'])
         self.model.summary()
 
         # Generate a unique ID for this run
@@ -61,7 +97,8 @@ class BERT():
 
         # Load weights from checkpoint if specified
         if self.load_checkpoint_from:
-            self.model.load_weights(self.load_checkpoint_from)
+            with self.strategy.scope():
+                self.model.load_weights(self.load_checkpoint_from)
             print('Loaded checkpoint')
 
         # Save the parameters
@@ -75,9 +112,11 @@ class BERT():
         """Loads data from file and prepares it for training"""
 
         self.dataset = get_dataset(self.dataset_id)
-        self.tokenized_dataset = get_tokenized_dataset(self.dataset_id,
-                                                       self.dataset,
-                                                       self.tokenizer)
+        self.tokenized_dataset = get_tokenized_dataset(
+            self.dataset_id,
+            self.dataset,
+            self.tokenizer,
+            num_proc=self.tokenizer_num_proc)
         self.tf_dataset = get_tf_dataset(self.tokenized_dataset,
                                          self.batch_size, self.tokenizer)
 